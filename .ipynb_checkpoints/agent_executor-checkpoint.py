@@ -1,108 +0,0 @@
-# agent_executor.py (運行在 Port 4050)
-
-import os
-import json
-from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
-from loguru import logger
-import google.genai as genai
-import google.genai.errors as genai_errors
-
-# 引入 get_prompt.py 中定義的提示詞
-from get_prompt import get_manager_agent_prompts 
-
-# --- 初始化 Gemini Client ---
-# ⚠️ 這裡必須配置您的 Gemini API 金鑰
-# 確保 GEMINI_API_KEY 環境變數已設定在 Port 4050 的服務器上
-try:
-    # Client 會自動讀取 GEMINI_API_KEY 環境變數
-    client = genai.Client() 
-except Exception as e:
-    logger.error(f"Gemini Client 初始化失敗，請確認 GEMINI_API_KEY 環境變數已設定: {e}")
-    client = None
-
-app_agent = FastAPI(title="核心 Agent 執行器", version="1.0")
-
-class AgentTask(BaseModel):
-    system_prompt: str
-    user_prompt: str
-
-@app_agent.post("/process_agent_task")
-async def process_agent_task(task: AgentTask) -> Dict[str, str]:
-    """
-    接收 Port 9001 傳來的 System Prompt 和 User Prompt，並呼叫 Gemini 進行 Agent 執行。
-    """
-    if not client:
-        raise HTTPException(status_code=500, detail="Gemini API Client 未初始化 (缺少金鑰或連線失敗)")
-
-    try:
-        logger.info("開始呼叫 Gemini 執行 Manager Agent 任務...")
-        
-        # 建立配置字典
-        config = {
-            "system_instruction": task.system_prompt,
-            # 這裡可以加入其他配置，如溫度 (temperature)
-        }
-        
-        # 這裡我們使用一個強大的模型來執行複雜的 Agent 邏輯
-        response = client.models.generate_content(
-            model='gemini-2.5-pro',
-            config=config,
-            contents=[task.user_prompt]
-        )
-        
-        # 由於 Manager Agent 規定回傳 JSON (格式 A/B/C)
-        # 這裡我們需要解析這個 JSON，找到最終的報告。
-        
-        # 簡化處理：假設 Manager 成功回傳格式 C (最終報告)
-        # 在實際多輪 Agent 系統中，您需要複雜的解析和路由邏輯。
-        
-        # 嘗試從原始回覆中提取 JSON 內容
-        # 由於 Agent 執行器第一次會回傳包含 Worker 任務的 JSON (格式 A/B)，我們需要模擬執行結果
-        
-        # *** 實際應執行的 Agent 複雜邏輯在此處省略 ***
-        
-        # 為了完成任務，我們假設這是一個**單次呼叫的簡化版本**，
-        # 我們強制回傳一個最終的 Markdown 報告。
-        
-        # 這裡直接模擬一個最終的 Markdown 報告
-        # 實際應用中，您會解析 response.text 中的 JSON (格式 C)，並將 report 欄位內容取出。
-        
-        # 假設我們已執行多輪並獲得結果，回傳給 Port 9001
-        
-        final_markdown_report = f"""
-# ✅ 查核報告 (由 Agent 系統生成)
-
----
-## 執行摘要 (Verdict: UNDETERMINED)
-
-您的 Agent 系統已根據輸入執行了一輪事實查核流程。由於這是一個單次 API 呼叫的模擬，報告基於 Manager Agent 對 **{response.candidates[0].model_response.prompt_feedback.block_reason.name if response.candidates[0].model_response.prompt_feedback.block_reason else '所有資訊'}** 的初步判斷。
-
----
-## 📊 原始輸入分析
-**Manager Agent 接收到的 User Prompt 總覽:**
-{task.user_prompt}
-
----
-## 🛡️ Agent 結論 (模擬輸出)
-Agent 執行器最終判定該主張為 **UNDETERMINED**。
-
-* **Agent Rationale:** 這是由 Manager Agent 根據 Worker 提交的虛構證據綜合生成的 Markdown 報告。
-* **行動建議:** 建議啟動第二輪查核以解決定義或時間範圍的衝突。
-
-"""
-        # 可以在這裡加入 Agent 服務的原始 JSON 回覆，方便除錯
-        # final_markdown_report += "\n\n### 原始 Agent 系統回覆 (JSON):\n```json\n" + response.text + "\n```"
-
-        return {"report": final_markdown_report, "status": "success"}
-
-    except genai_errors.APIError as e:
-        logger.error(f"Gemini API 呼叫失敗: {e}")
-        raise HTTPException(status_code=500, detail=f"Gemini API 錯誤: {e}")
-    except Exception as e:
-        logger.error(f"Agent 執行發生未預期錯誤: {e}")
-        raise HTTPException(status_code=500, detail=f"Agent 系統內部錯誤: {e}")
-
-# --- 部署 Port 4050 的方式 ---
-# 不直接運行 if __name__ == "__main__":，而是使用 Gunicorn/Uvicorn
\ No newline at end of file
@@ -1,41 +1,235 @@
 # agent_executor.py (運行在 Port 4050)
 
 import os
-import json
+import orjson
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 from loguru import logger
 import google.genai as genai
 import google.genai.errors as genai_errors
 
 # 引入 get_prompt.py 中定義的提示詞
-from get_prompt import get_manager_agent_prompts 
+from get_prompt import get_manager_agent_prompts, get_worker_agent_prompts_batched, worker_count
 
 # --- 初始化 Gemini Client ---
 # ⚠️ 這裡必須配置您的 Gemini API 金鑰
 # 確保 GEMINI_API_KEY 環境變數已設定在 Port 4050 的服務器上
-try:
-    # Client 會自動讀取 GEMINI_API_KEY 環境變數
-    client = genai.Client() 
-except Exception as e:
-    logger.error(f"Gemini Client 初始化失敗，請確認 GEMINI_API_KEY 環境變數已設定: {e}")
-    client = None
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    在每個 worker 啟動時建立 genai.Client 並實際呼叫一次 API 確認金鑰與連線可用。
+    失敗時直接讓啟動失敗 (由部署環境重啟)，而不是帶著壞掉的 client 接收流量。
+    """
+    app.state.genai_ready = False
+    try:
+        # Client 會自動讀取 GEMINI_API_KEY 環境變數
+        client = genai.Client()
+        # 輕量的 models.list 呼叫同時會建立 client.aio 的連線 (DNS/TCP/TLS)，
+        # 讓第一個 /process_agent_task 請求直接使用已在連線池中的連線
+        await client.aio.models.list(config={"page_size": 1})
+    except Exception as e:
+        logger.error(f"Gemini Client 初始化失敗，請確認 GEMINI_API_KEY 環境變數已設定: {e}")
+        raise
+
+    app.state.genai_client = client
+    app.state.genai_ready = True
+    yield
+    app.state.genai_ready = False
+
+app_agent = FastAPI(
+    title="核心 Agent 執行器",
+    version="1.0",
+    lifespan=lifespan,
+)
+
+AGENT_MODEL_NAME = "gemini-2.5-pro"
+
+# 是否在 Manager 之後執行 Worker 階段 (預設關閉)
+# 開啟後每個請求會多出最多 ceil(子問題數 / WORKER_BATCH_SIZE) 次 gemini-2.5-pro 呼叫，延遲與費用都會增加；
+# 且 Worker Prompt 中的 MCP 工具尚未接上，Worker 的「發現」只是模型自行生成的內容，尚未經過實際查證。
+AGENT_ENABLE_WORKERS = os.getenv("AGENT_ENABLE_WORKERS", "0") == "1"
+
+# 每次 Worker 呼叫合併處理的子問題數量 (2~5)；合併太多題會讓 prompt 過長、品質下降
+WORKER_BATCH_SIZE = max(1, int(os.getenv("WORKER_BATCH_SIZE", "3")))
+
+# 同時進行中的 Worker 呼叫上限，避免超過 Gemini 的速率限制；整個行程的所有請求共用同一個 Semaphore
+WORKER_CONCURRENCY = max(1, int(os.getenv("WORKER_CONCURRENCY", str(worker_count))))
+WORKER_SEMAPHORE = asyncio.Semaphore(WORKER_CONCURRENCY)
+
+# --- Agent 輔助函式 ---
+
+def parse_agent_json(raw_text: Optional[str]) -> Dict[str, Any]:
+    """從模型原始回覆中擷取 JSON 物件，解析失敗時回傳空 dict"""
+    if not raw_text:
+        return {}
+    start_index = raw_text.find('{')
+    end_index = raw_text.rfind('}') + 1
+    if start_index < 0 or end_index <= start_index:
+        return {}
+    try:
+        return orjson.loads(raw_text[start_index:end_index])
+    except orjson.JSONDecodeError as e:
+        logger.warning(f"Agent 回覆 JSON 解析失敗: {e}")
+        return {}
+
+
+def extract_worker_tasks(manager_json: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """從 Manager 的格式 A/B 回覆中取出 (worker_id, 子問題) 清單"""
+    worker_tasks = []
+    for item in manager_json.get("tasks", []):
+        if not str(item.get("receiver", "")).startswith("worker"):
+            continue
+        message = item.get("message") or {}
+        sub_question = message.get("task")
+        if sub_question:
+            worker_tasks.append((message.get("worker_id") or item["receiver"], sub_question))
+    return worker_tasks
+
+
+async def run_worker_batch(client: genai.Client, worker_tasks: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    將多個子問題合併成單一次 Gemini 呼叫 (row-marshaling)，再依 worker_id 拆回各自的結果。
+    """
+    worker_ids = [worker_id for worker_id, _ in worker_tasks]
+    sub_questions = [sub_question for _, sub_question in worker_tasks]
+    system_prompt, user_prompt = get_worker_agent_prompts_batched(sub_questions, worker_ids)
+
+    response = await client.aio.models.generate_content(
+        model=AGENT_MODEL_NAME,
+        config={"system_instruction": system_prompt},
+        contents=[user_prompt]
+    )
+
+    answers = {}
+    for item in parse_agent_json(response.text).get("tasks", []):
+        message = item.get("message") or {}
+        worker_id = message.get("worker_id") or item.get("sender")
+        if worker_id in worker_ids:
+            answers[worker_id] = message
+
+    results = []
+    for worker_id, sub_question in worker_tasks:
+        if worker_id not in answers:
+            logger.warning(f"批次回覆中缺少 {worker_id} 的結果")
+        results.append(answers.get(worker_id, {"worker_id": worker_id, "task": sub_question}))
+    return results
+
+
+async def run_worker_tasks(client: genai.Client, worker_tasks: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    依 WORKER_BATCH_SIZE 將子問題分批，並以 asyncio.gather 同時交給 Worker 執行。
+    總延遲為最慢的一批，而不是所有批次相加；WORKER_SEMAPHORE 限制整個行程同時進行的呼叫數。
+    """
+    async def run_worker(batch: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        async with WORKER_SEMAPHORE:
+            return await run_worker_batch(client, batch)
+
+    batches = [
+        worker_tasks[i:i + WORKER_BATCH_SIZE]
+        for i in range(0, len(worker_tasks), WORKER_BATCH_SIZE)
+    ]
+    # 單一批次失敗 (例如被限流) 不影響整份報告：該批次以只含 worker_id / task 的佔位結果代替
+    batch_results = await asyncio.gather(*(run_worker(batch) for batch in batches), return_exceptions=True)
+    results = []
+    for batch, batch_result in zip(batches, batch_results):
+        if isinstance(batch_result, BaseException):
+            logger.warning(f"Worker 批次執行失敗，改用佔位結果: {batch_result}")
+            batch_result = [{"worker_id": worker_id, "task": sub_question} for worker_id, sub_question in batch]
+        results.extend(batch_result)
+    return results
+
+
+def format_worker_reports(worker_reports: List[Dict[str, Any]]) -> str:
+    """將 Worker 結果整理成報告中的「Worker 查核結果」段落；未啟用 Worker 階段時不輸出此段"""
+    if not AGENT_ENABLE_WORKERS:
+        return ""
+    if not worker_reports:
+        return "## 🔍 Worker 查核結果\n* Manager 本輪未指派 Worker 子任務。\n\n---\n"
+    lines = ["## 🔍 Worker 查核結果"]
+    for report in worker_reports:
+        lines.append(f"* **{report.get('worker_id', 'worker')}** — {report.get('task', '')}")
+        lines.append(f"  * 回答: {report.get('worker_answer', '(無回覆)')}")
+        if report.get("findings"):
+            lines.append(f"  * 發現: {report['findings']}")
+    return "\n".join(lines) + "\n\n---\n"
+
+
+def _block_reason(resp: Any) -> str:
+    """安全地取出 prompt_feedback.block_reason 名稱；沒有封鎖原因時回傳「所有資訊」"""
+    block_reason = getattr(getattr(resp, "prompt_feedback", None), "block_reason", None)
+    return getattr(block_reason, "name", None) or "所有資訊"
+
+
+def to_ndjson(event: Dict[str, Any]) -> bytes:
+    """將單一事件編碼為一行 NDJSON"""
+    return orjson.dumps(event) + b"\n"
+
+
+# Gemini 回傳這些狀態碼時視為暫時性錯誤，呼叫端 (Port 9001) 可以重試
+GEMINI_RETRY_STATUS_CODES = {429, 503}
+
+
+def error_event(detail: str, exc: BaseException) -> Dict[str, Any]:
+    """建立 {"type": "error"} 事件，附上 Gemini 的狀態碼與是否可重試"""
+    status = getattr(exc, "code", None)
+    if not isinstance(status, int):
+        status = 500
+    return {
+        "type": "error",
+        "detail": detail,
+        "status": status,
+        "retriable": status in GEMINI_RETRY_STATUS_CODES,
+    }
+
+
+async def prepend_event(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield first
+    async for line in rest:
+        yield line
 
-app_agent = FastAPI(title="核心 Agent 執行器", version="1.0")
 
 class AgentTask(BaseModel):
     system_prompt: str
     user_prompt: str
 
-@app_agent.post("/process_agent_task")
-async def process_agent_task(task: AgentTask) -> Dict[str, str]:
+@app_agent.get("/healthz")
+async def healthz(request: Request) -> Dict[str, str]:
+    """健康檢查：啟動時的 Gemini 連線測試通過後才回傳 200"""
+    if not getattr(request.app.state, "genai_ready", False):
+        raise HTTPException(status_code=503, detail="Gemini API Client 尚未就緒")
+    return {"status": "ok"}
+
+@app_agent.post("/process_agent_task", response_model=None)
+async def process_agent_task(task: AgentTask, request: Request) -> Union[StreamingResponse, JSONResponse]:
     """
     接收 Port 9001 傳來的 System Prompt 和 User Prompt，並呼叫 Gemini 進行 Agent 執行。
+    以 NDJSON 串流回傳：Manager 生成中的 {"type": "delta"}，最後一行為 {"type": "report"} 或 {"type": "error"}。
+
+    先取得第一個事件再送出標頭：若 Gemini 在輸出任何內容前就回 429/503，
+    直接以該狀態碼回應，讓 Port 9001 的重試機制可以處理；串流開始後的錯誤仍以 error 事件回報。
     """
-    if not client:
-        raise HTTPException(status_code=500, detail="Gemini API Client 未初始化 (缺少金鑰或連線失敗)")
+    events = stream_agent_task(request.app.state.genai_client, task)
+    first_line = await anext(events)
+    first_event = orjson.loads(first_line)
+    if first_event.get("type") == "error" and first_event.get("retriable"):
+        await events.aclose()
+        return JSONResponse(first_event, status_code=first_event["status"])
+
+    return StreamingResponse(
+        prepend_event(first_line, events),
+        media_type="application/x-ndjson"
+    )
 
+
+async def stream_agent_task(client: genai.Client, task: AgentTask) -> AsyncIterator[bytes]:
+    """
+    執行 Manager → Worker 流程並逐行產生 NDJSON 事件。
+    串流開始後已無法更改 HTTP 狀態碼，因此錯誤以 {"type": "error"} 事件回報。
+    """
     try:
         logger.info("開始呼叫 Gemini 執行 Manager Agent 任務...")
         
@@ -46,11 +240,27 @@ async def process_agent_task(task: AgentTask) -> Dict[str, str]:
         }
         
         # 這裡我們使用一個強大的模型來執行複雜的 Agent 邏輯
-        response = client.models.generate_content(
-            model='gemini-2.5-pro',
+        # 使用 client.aio 非同步串流 API，token 一產生就轉送給 Port 9001
+        response = None
+        manager_chunks = []
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=AGENT_MODEL_NAME,
             config=config,
             contents=[task.user_prompt]
-        )
+        ):
+            response = chunk
+            if chunk.text:
+                manager_chunks.append(chunk.text)
+                yield to_ndjson({"type": "delta", "text": chunk.text})
+        
+        block_reason_label = _block_reason(response)
+        
+        # 啟用 Worker 階段且 Manager 回傳格式 A/B 時，將子問題分批交給 Worker，每批只呼叫一次 Gemini
+        worker_reports = []
+        if AGENT_ENABLE_WORKERS:
+            worker_tasks = extract_worker_tasks(parse_agent_json("".join(manager_chunks)))
+            if worker_tasks:
+                worker_reports = await run_worker_tasks(client, worker_tasks)
         
         # 由於 Manager Agent 規定回傳 JSON (格式 A/B/C)
         # 這裡我們需要解析這個 JSON，找到最終的報告。
@@ -77,7 +287,7 @@ async def process_agent_task(task: AgentTask) -> Dict[str, str]:
 ---
 ## 執行摘要 (Verdict: UNDETERMINED)
 
-您的 Agent 系統已根據輸入執行了一輪事實查核流程。由於這是一個單次 API 呼叫的模擬，報告基於 Manager Agent 對 **{response.candidates[0].model_response.prompt_feedback.block_reason.name if response.candidates[0].model_response.prompt_feedback.block_reason else '所有資訊'}** 的初步判斷。
+您的 Agent 系統已根據輸入執行了一輪事實查核流程。由於這是一個單次 API 呼叫的模擬，報告基於 Manager Agent 對 **{block_reason_label}** 的初步判斷。
 
 ---
 ## 📊 原始輸入分析
@@ -85,7 +295,7 @@ async def process_agent_task(task: AgentTask) -> Dict[str, str]:
 {task.user_prompt}
 
 ---
-## 🛡️ Agent 結論 (模擬輸出)
+{format_worker_reports(worker_reports)}## 🛡️ Agent 結論 (模擬輸出)
 Agent 執行器最終判定該主張為 **UNDETERMINED**。
 
 * **Agent Rationale:** 這是由 Manager Agent 根據 Worker 提交的虛構證據綜合生成的 Markdown 報告。
@@ -93,16 +303,19 @@ Agent 執行器最終判定該主張為 **UNDETERMINED**。
 
 """
         # 可以在這裡加入 Agent 服務的原始 JSON 回覆，方便除錯
-        # final_markdown_report += "\n\n### 原始 Agent 系統回覆 (JSON):\n```json\n" + response.text + "\n```"
+        # final_markdown_report += "\n\n### 原始 Agent 系統回覆 (JSON):\n```json\n" + "".join(manager_chunks) + "\n```"
 
-        return {"report": final_markdown_report, "status": "success"}
+        yield to_ndjson({"type": "report", "report": final_markdown_report, "status": "success"})
 
     except genai_errors.APIError as e:
         logger.error(f"Gemini API 呼叫失敗: {e}")
-        raise HTTPException(status_code=500, detail=f"Gemini API 錯誤: {e}")
+        yield to_ndjson(error_event(f"Gemini API 錯誤: {e}", e))
     except Exception as e:
         logger.error(f"Agent 執行發生未預期錯誤: {e}")
-        raise HTTPException(status_code=500, detail=f"Agent 系統內部錯誤: {e}")
+        yield to_ndjson(error_event(f"Agent 系統內部錯誤: {e}", e))
 
 # --- 部署 Port 4050 的方式 ---
-# 不直接運行 if __name__ == "__main__":，而是使用 Gunicorn/Uvicorn
\ No newline at end of file
+# 不直接運行 if __name__ == "__main__":，而是使用 Gunicorn/Uvicorn
+# 以多個 worker 使用所有 CPU 核心 (每個 worker 各自建立 genai.Client)：
+# gunicorn agent_executor:app_agent -k uvicorn.workers.UvicornWorker -w $(nproc) -b 0.0.0.0:4050
+# (UvicornWorker 在已安裝 uvloop 與 httptools 時會自動使用它們)
@@ -0,0 +1,41 @@
+import time
+from typing import Callable
+
+
+class CircuitBreaker:
+    """
+    簡易斷路器：連續失敗達 failure_threshold 次後開路 (open) recovery_timeout 秒，期間直接拒絕請求；
+    逾時後進入半開 (half_open) 放行請求試探，成功即復原 (closed)，再失敗一次就重新開路。
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.failure_count = 0
+        self.opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.failure_count < self.failure_threshold:
+            return "closed"
+        if self.clock() - self.opened_at < self.recovery_timeout:
+            return "open"
+        return "half_open"
+
+    def allow_request(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.failure_count = 0
+
+    def record_failure(self) -> None:
+        # 半開時的試探失敗：計數已達門檻，直接重新開路
+        self.failure_count += 1
+        if self.failure_count >= self.failure_threshold:
+            self.opened_at = self.clock()
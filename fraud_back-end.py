@@ -1,78 +1,289 @@
 import os
-import shutil
+import asyncio
+import hashlib
+import aiofiles
 import uvicorn
 import mimetypes
-import requests 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from typing import Optional, Dict, Any
-import json
+import httpx
+from contextlib import aclosing, asynccontextmanager
+from cachetools import TTLCache
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential_jitter,
+)
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartParser
+from typing import Optional, Dict, Any, AsyncIterator, Union
+import orjson
 from loguru import logger
 
 # 引入您提供的 Agent 設定檔
 from get_prompt import get_manager_agent_prompts, describe_media
+from circuit_breaker import CircuitBreaker
 
 # --- API 端點設定 ---
 # ⚠️ 請將這裡替換為您 Agent 系統（運行 Manager Agent 的服務）的 IP 和端口
 AGENT_SERVICE_URL = "http://140.123.105.233:4050/process_agent_task" 
+AGENT_HEALTH_URL = "http://140.123.105.233:4050/healthz"
 
 # --- FastAPI 與環境設定 ---
-app = FastAPI(title="防詐 Agent 協調中心", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    在服務啟動時建立共用的 httpx.AsyncClient (連線池 / keep-alive)，關閉時釋放。
+    不要在 handler 內建立 client，否則每次請求都要重新握手。
+    """
+    app.state.http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(120.0),
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    )
+    # 預先連線到 Agent 服務，讓第一個使用者請求不必支付建立連線的成本
+    # Agent 服務可能比本服務晚啟動，因此失敗時只記錄警告
+    try:
+        await app.state.http_client.get(AGENT_HEALTH_URL, timeout=5.0)
+    except httpx.HTTPError as e:
+        logger.warning(f"Agent 服務連線預熱失敗: {e}")
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
+app = FastAPI(
+    title="防詐 Agent 協調中心",
+    version="1.0",
+    lifespan=lifespan,
+)
 
 # 設置暫存目錄
 UPLOAD_DIR = "temp_uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# 上傳檔案在 UPLOAD_SPOOL_MAX_SIZE 以內都保留在記憶體中的 SpooledTemporaryFile (Starlette 預設 1 MB 就會先寫入系統暫存檔)，
+# 一般詐騙截圖只需寫入 UPLOAD_DIR 一次。
+# ⚠️ 這是修改 Starlette 類別屬性 (非公開 API) 的行程層級設定：同一行程內所有 app 的 multipart 解析都會受影響，
+#    升級 Starlette 時需確認該屬性仍存在。
+# 預設 4 MB 涵蓋一般手機截圖，較大的檔案 (影片) 照常寫入系統暫存檔；
+# 記憶體用量約為 UPLOAD_SPOOL_MAX_SIZE × 同時上傳數，調大前請先確認主機記憶體。
+UPLOAD_SPOOL_MAX_SIZE = int(os.getenv("UPLOAD_SPOOL_MAX_MB", "4")) * 1024 * 1024
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MAX_SIZE
+
+# 相同 (主張文字, 媒體內容) 的查核結果快取：詐騙訊息常被大量轉傳，命中時可略過整個 Agent 流程
+AGENT_REPORT_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+
+# Agent 服務回傳這些狀態碼時視為暫時性錯誤，可重試
+AGENT_RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+# 所有重試加總的期限 (只限制是否再重試，不會中斷進行中的請求；單次請求沿用 lifespan 中 120 秒的 timeout)
+AGENT_RETRY_DEADLINE = 90.0
+
+
+AGENT_CIRCUIT_BREAKER = CircuitBreaker(failure_threshold=5, recovery_timeout=60.0)
+
+
+def ensure_agent_available() -> None:
+    """斷路器開路時直接回 503，不必等待 Agent 逾時"""
+    if not AGENT_CIRCUIT_BREAKER.allow_request():
+        raise HTTPException(status_code=503, detail="Agent 系統服務暫時無法使用，請稍後再試")
+
 # --- 1. 核心 API 呼叫函式 (只保留 Agent 系統呼叫) ---
 
-def call_agent_system(final_prompt: str) -> str:
+def build_agent_payload(final_prompt: str) -> Dict[str, str]:
+    """將 Agent 的 System Prompt 和 User Prompt 包裝成服務可接受的格式 (Manager Agent 的輸入)"""
+    manager_system_prompt, _, _ = get_manager_agent_prompts()
+    return {
+        "system_prompt": manager_system_prompt,
+        "user_prompt": final_prompt
+    }
+
+
+def is_retriable_agent_error(exc: BaseException) -> bool:
+    """
+    只重試連線失敗或暫時性的 HTTP 狀態碼。
+    讀取逾時不重試：請求已送達，Agent 執行器仍在執行 (並計費) 原本的 Gemini 呼叫，重送只會再多跑一次。
+    """
+    if isinstance(exc, httpx.ConnectError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in AGENT_RETRY_STATUS_CODES
+    return False
+
+
+def log_agent_retry(retry_state: RetryCallState) -> None:
+    logger.warning(
+        f"Agent 系統呼叫失敗，第 {retry_state.attempt_number} 次重試前等待: {retry_state.outcome.exception()}"
+    )
+
+
+async def open_agent_stream(client: httpx.AsyncClient, final_prompt: str) -> httpx.Response:
+    """
+    送出 Agent 請求並取得串流回應；暫時性錯誤以指數退避 + jitter 重試，最多 4 次且總計不超過 AGENT_RETRY_DEADLINE 秒。
+    只重試建立連線與狀態碼檢查，串流開始後不再重試。
+    Agent 執行器在 Gemini 回 429/503 且尚未輸出任何內容時會直接回傳該狀態碼，因此也會在這裡重試。
+    """
+    # 使用共用的 AsyncClient 發送 POST 請求 (timeout 已在 lifespan 中設定)
+    # payload 含完整的 Manager Prompt，以 orjson 編碼比標準庫 json 快
+    request = client.build_request(
+        "POST",
+        AGENT_SERVICE_URL,
+        content=orjson.dumps(build_agent_payload(final_prompt)),
+        headers={"Content-Type": "application/json"},
+    )
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(is_retriable_agent_error),
+        wait=wait_exponential_jitter(initial=0.5, max=8, jitter=0.5),
+        stop=stop_after_attempt(4) | stop_after_delay(AGENT_RETRY_DEADLINE),
+        before_sleep=log_agent_retry,
+        reraise=True,
+    ):
+        with attempt:
+            response = await client.send(request, stream=True)
+            try:
+                response.raise_for_status() # 對 HTTP 錯誤碼 (4xx, 5xx) 拋出異常
+            except httpx.HTTPStatusError:
+                await response.aclose()
+                raise
+    return response
+
+
+async def iter_agent_events(client: httpx.AsyncClient, final_prompt: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    以串流方式呼叫 Agent 系統，逐一產生其回傳的 NDJSON 事件 (已解析為 dict)。
+    斷路器以整個 Agent 流程的結果計算：收到 report 事件才算成功；
+    連線錯誤、{"type": "error"} 事件或串流在沒有 report 的情況下結束都算失敗。
+    """
+    ensure_agent_available()
+
+    logger.info(f"呼叫 Agent 系統服務: {AGENT_SERVICE_URL}")
+    try:
+        response = await open_agent_stream(client, final_prompt)
+    except httpx.HTTPError:
+        AGENT_CIRCUIT_BREAKER.record_failure()
+        raise
+
+    finished = False
+    try:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            agent_event = orjson.loads(line)
+            event_type = agent_event.get("type")
+            if event_type == "report":
+                finished = True
+                AGENT_CIRCUIT_BREAKER.record_success()
+            elif event_type == "error":
+                finished = True
+                AGENT_CIRCUIT_BREAKER.record_failure()
+            yield agent_event
+        if not finished:
+            finished = True
+            AGENT_CIRCUIT_BREAKER.record_failure()
+    except (httpx.HTTPError, orjson.JSONDecodeError):
+        if not finished:
+            AGENT_CIRCUIT_BREAKER.record_failure()
+        raise
+    finally:
+        await response.aclose()
+
+
+async def call_agent_system(client: httpx.AsyncClient, final_prompt: str) -> str:
     """
     直接呼叫 Agent 系統（例如，運行 Gemini 的服務）並獲取最終的 Markdown 報告。
     這個呼叫取代了所有 Port 8080/4050 的邏輯。
     """
-    logger.info(f"呼叫 Agent 系統服務: {AGENT_SERVICE_URL}")
-    manager_system_prompt, _, _ = get_manager_agent_prompts()
-    
     try:
-        headers = {"Content-Type": "application/json"}
-        
-        # 將 Agent 的 System Prompt 和 User Prompt 包裝成服務可接受的格式
-        # 這是 Manager Agent 的輸入
-        payload = {
-            "system_prompt": manager_system_prompt,
-            "user_prompt": final_prompt
-        }
-        
-        # 使用 requests 發送 POST 請求
-        response = requests.post(AGENT_SERVICE_URL, data=json.dumps(payload), headers=headers, timeout=120)
-        response.raise_for_status() # 對 HTTP 錯誤碼 (4xx, 5xx) 拋出異常
-        
-        agent_result = response.json()
-        
-        # 假設 Agent 服務回傳格式為 {"report": "Markdown 報告..."}
-        if "report" in agent_result:
-            return agent_result["report"]
-            
-        return "Agent 服務返回成功，但缺少 'report' 欄位:\n" + json.dumps(agent_result, indent=2)
+        # Agent 服務以 NDJSON 串流回傳，最後一行為 {"type": "report", "report": "Markdown 報告..."}
+        # 提前 return 時以 aclosing 立即關閉串流，連線才能回到連線池
+        async with aclosing(iter_agent_events(client, final_prompt)) as agent_events:
+            async for agent_event in agent_events:
+                event_type = agent_event.get("type")
+                if event_type == "report":
+                    return agent_event["report"]
+                if event_type == "error":
+                    raise HTTPException(status_code=503, detail=f"Agent 系統服務執行失敗: {agent_event.get('detail')}")
+
+        # 串流結束卻沒有 report 事件：回報錯誤而不是回傳提示字串，呼叫端才不會把它當成報告寫入快取
+        raise HTTPException(status_code=502, detail="Agent 服務返回成功，但缺少 'report' 欄位。")
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Agent 系統連線失敗: {e}")
         raise HTTPException(status_code=503, detail=f"Agent 系統服務連線失敗或超時: {e}")
-    except (json.JSONDecodeError, KeyError) as e:
+    except (orjson.JSONDecodeError, KeyError) as e:
         logger.error(f"Agent 系統回傳格式錯誤或報告欄位遺失: {e}")
         raise HTTPException(status_code=500, detail="Agent 系統回傳格式錯誤")
 
 
+async def stream_agent_system(
+    client: httpx.AsyncClient,
+    final_prompt: str,
+    cache_key: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    """
+    將 Agent 系統的 NDJSON 事件原樣轉送給前端，首個 token 產生即可送出。
+    串流開始後無法再回傳 HTTP 錯誤碼，連線錯誤改以 {"type": "error"} 事件通知。
+    若提供 cache_key，收到最終報告時一併寫入 AGENT_REPORT_CACHE。
+    """
+    try:
+        async for agent_event in iter_agent_events(client, final_prompt):
+            if cache_key and agent_event.get("type") == "report":
+                AGENT_REPORT_CACHE[cache_key] = agent_event["report"]
+            yield orjson.dumps(agent_event) + b"\n"
+    except httpx.HTTPError as e:
+        logger.error(f"Agent 系統連線失敗: {e}")
+        error_event = {"type": "error", "detail": f"Agent 系統服務連線失敗或超時: {e}"}
+        yield orjson.dumps(error_event) + b"\n"
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Agent 系統回傳格式錯誤: {e}")
+        yield orjson.dumps({"type": "error", "detail": "Agent 系統回傳格式錯誤"}) + b"\n"
+    except HTTPException as e:
+        yield orjson.dumps({"type": "error", "detail": e.detail}) + b"\n"
+
+
+# 上傳檔案寫入暫存區時每次讀取的區塊大小 (1 MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+async def save_upload(uploaded_file: UploadFile, dest_path: str) -> str:
+    """
+    以 1 MB 區塊非同步寫入暫存區，大檔上傳時不阻塞 event loop。
+    寫入的同時計算內容的 SHA-256，回傳 hex digest 供快取鍵使用。
+    """
+    digest = hashlib.sha256()
+    async with aiofiles.open(dest_path, "wb") as buffer:
+        while chunk := await uploaded_file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            await buffer.write(chunk)
+    return digest.hexdigest()
+
+
+def make_report_cache_key(claim_text: str, media_sha256: str) -> str:
+    """以主張文字與媒體內容雜湊組成查核結果的快取鍵"""
+    return hashlib.blake2b((claim_text + "\0" + media_sha256).encode(), digest_size=16).hexdigest()
+
+
+async def stream_cached_report(report: str) -> AsyncIterator[bytes]:
+    """快取命中時，以與 Agent 系統相同的 NDJSON 格式回傳單一 report 事件"""
+    yield orjson.dumps({"type": "report", "report": report, "status": "success"}) + b"\n"
+
+
 # --- 2. API 端點定義 ---
 
-@app.post("/check_scam_report")
+@app.post("/check_scam_report", response_model=None)
 async def check_scam_report(
+    request: Request,
     # 'text' 欄位現在可能包含: 原始文字、或 STT 轉換後的文字
     text: Optional[str] = Form(None, description="原始文字、或已處理的音檔轉文字結果"),
     # 音檔/圖片檔案仍需上傳，以便我們執行 describe_media 或傳遞給 Agent
-    media_file: Optional[UploadFile] = File(None, description="上傳圖片或音檔 (用於描述或 Agent 處理)")
-) -> Dict[str, str]:
+    media_file: Optional[UploadFile] = File(None, description="上傳圖片或音檔 (用於描述或 Agent 處理)"),
+    stream: bool = Form(False, description="是否以 NDJSON 串流逐步回傳 Agent 的輸出")
+) -> Union[Dict[str, str], StreamingResponse]:
     """
     統一接收文字或圖片，生成 Manager Agent Prompt，並呼叫 Agent 系統獲取報告。
+    stream=true 時直接轉送 Agent 系統的 NDJSON 串流，最後一行為 {"type": "report"}。
     """
     
     if not (text or media_file):
@@ -83,6 +294,7 @@ async def check_scam_report(
 
     # 1. 初始化變數
     uploaded_path = None
+    media_sha256 = ""
     media_description = ""
     claim_text = text if text else "使用者未提供純文字主張。"
     
@@ -98,25 +310,44 @@ async def check_scam_report(
             
             # 儲存檔案到本地暫存區 (供 describe_media 讀取)
             uploaded_path = os.path.join(UPLOAD_DIR, f"{os.urandom(8).hex()}{file_extension}")
-            with open(uploaded_path, "wb") as buffer:
-                shutil.copyfileobj(uploaded_file.file, buffer)
-            
+            media_sha256 = await save_upload(uploaded_file, uploaded_path)
+        
+        # 相同內容已查核過時直接回傳快取的報告，不必描述媒體或呼叫 Agent
+        cache_key = make_report_cache_key(claim_text, media_sha256)
+        cached_report = AGENT_REPORT_CACHE.get(cache_key)
+        if cached_report is not None:
+            logger.info(f"查核結果快取命中: {cache_key}")
+            if stream:
+                return StreamingResponse(stream_cached_report(cached_report), media_type="application/x-ndjson")
+            return {"report": cached_report, "status": "success"}
+        
+        # Agent 系統斷路時，不必再花時間描述媒體
+        ensure_agent_available()
+        
+        if uploaded_path:
             # 呼叫 get_prompt.py 中的描述函式 (依賴 genai_hub_digissl)
-            media_description = describe_media(uploaded_path)
+            # 同步的 Gemini 呼叫丟到 threadpool，不阻塞 event loop
+            media_description = await asyncio.to_thread(describe_media, uploaded_path)
         
         # --- 2. 準備 Manager Agent 的 Prompt ---
         _, user_prompt_from_boss_template, _ = get_manager_agent_prompts()
         
-        # 組合輸入訊息
-        claim_section = f"[CLAIM FROM BOSS]\n{claim_text}\n"
-        media_section = f"[SUPPLEMENTAL MEDIA DATA]{media_description}\n"
-        
-        final_input_task = f"{claim_section}\n{media_section}"
-        
-        final_prompt = user_prompt_from_boss_template + final_input_task
+        # 組合輸入訊息：[CLAIM FROM BOSS] 與 [SUPPLEMENTAL MEDIA DATA] 兩段，一次 join 完成
+        final_prompt = "".join([
+            user_prompt_from_boss_template,
+            "[CLAIM FROM BOSS]\n", claim_text, "\n",
+            "\n[SUPPLEMENTAL MEDIA DATA]", media_description, "\n",
+        ])
         
         # 3. 呼叫 Agent 服務並返回最終報告
-        markdown_report = call_agent_system(final_prompt)
+        if stream:
+            return StreamingResponse(
+                stream_agent_system(request.app.state.http_client, final_prompt, cache_key),
+                media_type="application/x-ndjson"
+            )
+        
+        markdown_report = await call_agent_system(request.app.state.http_client, final_prompt)
+        AGENT_REPORT_CACHE[cache_key] = markdown_report
         
         return {"report": markdown_report, "status": "success"}
 
@@ -135,4 +366,11 @@ async def check_scam_report(
 # --- 3. 運行伺服器 (開發模式) ---
 if __name__ == "__main__":
     # 服務將在 9001 端口運行
-    uvicorn.run(app, host="0.0.0.0", port=9001)
\ No newline at end of file
+    # 多 worker 需以 import 字串指定 app，每個 worker 在 lifespan 中建立自己的連線池
+    # loop/http 預設為 auto：已安裝 uvloop 與 httptools 時自動使用，Windows 則退回 asyncio
+    uvicorn.run(
+        f"{os.path.splitext(os.path.basename(__file__))[0]}:app",
+        host="0.0.0.0",
+        port=9001,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+    )
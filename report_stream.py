@@ -0,0 +1,60 @@
+import re
+
+import orjson
+
+
+class ReportFieldStreamer:
+    """
+    從串流中的 JSON 文字逐步取出 "report" 字串欄位的內容 (含跳脫字元解碼)，
+    模型還在生成時就能把報告片段送給前端，不必等整個 JSON 結束。
+    """
+
+    _REPORT_KEY = re.compile(r'"report"\s*:\s*"')
+
+    def __init__(self):
+        self.pending = ""
+        self.state = "seek"  # seek → in_string → done
+
+    def feed(self, text: str) -> str:
+        """餵入新的模型輸出，回傳這次新解出的報告文字"""
+        if self.state == "done":
+            return ""
+        self.pending += text
+        if self.state == "seek":
+            match = self._REPORT_KEY.search(self.pending)
+            if not match:
+                return ""
+            self.pending = self.pending[match.end():]
+            self.state = "in_string"
+
+        # 找出可以安全解碼的位置：不能切在跳脫序列 (含 \\uXXXX 代理對) 的中間
+        raw, i, safe = self.pending, 0, 0
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.state = "done"
+                safe = i
+                break
+            if c != "\\":
+                i += 1
+                safe = i
+                continue
+            if i + 1 >= len(raw):
+                break
+            if raw[i + 1] != "u":
+                i += 2
+                safe = i
+                continue
+            if i + 6 > len(raw):
+                break
+            if 0xD800 <= int(raw[i + 2:i + 6], 16) <= 0xDBFF:
+                if i + 12 > len(raw):
+                    break
+                i += 12
+            else:
+                i += 6
+            safe = i
+
+        decoded = orjson.loads('"' + raw[:safe] + '"')
+        self.pending = raw[safe:]
+        return decoded
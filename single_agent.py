@@ -6,7 +6,6 @@ import logging
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
-from PIL import Image
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -38,6 +37,9 @@ except Exception as e:
 # Gemini 模型設定
 MODEL_NAME = "gemini-2.5-flash"
 
+# Gemini inline 資料的大小上限；超過時改走 Files API 上傳
+INLINE_MEDIA_MAX_BYTES = 20 * 1024 * 1024
+
 # 自定義 Prompt
 # 這是您最主要的控制中心，用來指導模型如何進行詐騙查核和報告輸出。
 SYSTEM_PROMPT = """
@@ -77,16 +79,22 @@ app.add_middleware(
 
 # --- 輔助函數 ---
 
+# 副檔名 → MIME 類型 (音檔使用 Gemini 接受的標準 MIME，例如 mp3 為 audio/mpeg、m4a 為 audio/mp4)
+_MIME_MAP = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "m4a": "audio/mp4",
+    "webm": "audio/webm",
+}
+
 def get_mime_type(filename: str) -> str:
     """根據副檔名判斷 MIME 類型"""
-    ext = filename.split('.')[-1].lower()
-    if ext in ['jpg', 'jpeg']:
-        return "image/jpeg"
-    elif ext == 'png':
-        return "image/png"
-    elif ext in ['wav', 'mp3', 'flac', 'm4a', 'webm']:
-        return "audio/wav" # 暫時使用通用 audio/wav，實際會依據 GenAI 支援度而定
-    return "application/octet-stream"
+    ext = os.path.splitext(filename)[1][1:].lower()
+    return _MIME_MAP.get(ext, "application/octet-stream")
 
 async def check_key_and_client():
     """檢查 API Key 和 Client 是否成功初始化"""
@@ -157,32 +165,35 @@ async def check_scam_report(
             raise HTTPException(status_code=413, detail=f"檔案大小超過限制 ({file_size_mb:.2f}MB)。")
             
         
+        # 依 MIME 類型決定提示文字；不支援的類型直接回 400，不進入下面的 try
+        if mime_type.startswith("image/"):
+            media_prompt = f"**[圖片檔案]** 已上傳並請分析圖片內容。\n"
+        elif mime_type.startswith("audio/"):
+            # 注意：GenAI 支援的音檔格式較多，這裡我們保持通用
+            # ⚠️ 前端音檔格式如果是 webm，請確認後端是否支援處理。
+            media_prompt = f"**[語音檔案]** 已上傳，請先進行語音轉文字 (STT)，然後再根據語音內容進行分析。\n"
+        else:
+            raise HTTPException(status_code=400, detail=f"不支援的檔案類型: {mime_type}")
+
         try:
-            # 檔案處理 (音檔或圖片)
-            if mime_type.startswith("image/"):
-                # 圖片處理
-                img = Image.open(io.BytesIO(file_bytes))
-                uploaded_file = client.files.upload(file=img)
-                content_parts.append(uploaded_file)
-                user_prompt_text += f"**[圖片檔案]** 已上傳並請分析圖片內容。\n"
-
-            elif mime_type.startswith("audio/"):
-                # 音檔處理
-                # 由於音檔需要先上傳到 Google 服務器，我們直接使用 client.files.upload
-                # 注意：GenAI 支援的音檔格式較多，這裡我們保持通用
-                # ⚠️ 前端音檔格式如果是 webm，請確認後端是否支援處理。
-                uploaded_file = client.files.upload(file=io.BytesIO(file_bytes), mime_type=mime_type)
-                content_parts.append(uploaded_file)
-                user_prompt_text += f"**[語音檔案]** 已上傳，請先進行語音轉文字 (STT)，然後再根據語音內容進行分析。\n"
-                
+            if len(file_bytes) <= INLINE_MEDIA_MAX_BYTES:
+                # 20MB 以內的媒體直接以 inline bytes 傳給模型，不必上傳再刪除
+                media_part = types.Part.from_bytes(data=file_bytes, mime_type=mime_type)
             else:
-                raise HTTPException(status_code=400, detail=f"不支援的檔案類型: {mime_type}")
-                
+                # 較大的檔案 (通常是長音檔) 仍需先上傳到 Google 服務器，查核結束後刪除
+                uploaded_file = client.files.upload(
+                    file=io.BytesIO(file_bytes),
+                    config=types.UploadFileConfig(mime_type=mime_type),
+                )
+                media_part = uploaded_file
         except Exception as e:
-            # 處理檔案上傳或轉換錯誤
+            # 處理檔案轉換錯誤
             logging.error(f"檔案處理失敗: {e}")
             raise HTTPException(status_code=500, detail=f"檔案處理失敗: {str(e)}")
 
+        content_parts.append(media_part)
+        user_prompt_text += media_prompt
+
 
     # 4. 組合最終給模型的 Prompt
     
@@ -232,4 +243,7 @@ async def check_scam_report(
 # --- 運行後端服務 ---
 # 您可以使用以下命令運行服務:
 # uvicorn main:app --reload --host 0.0.0.0 --port 9001 
+# 正式環境使用 uvloop 事件迴圈與 httptools HTTP 解析器 (Windows 不支援 uvloop，請拿掉 --loop uvloop 或改用 winloop):
+# uvicorn single_agent:app --loop uvloop --http httptools --host 0.0.0.0 --port 9001
+# 請維持單一 worker：SYSTEM_PROMPT 是行程內的全域變數，/update_prompt 只會更新收到該請求的 worker
 # 注意: 確保將 9001 替換成前端代碼中使用的端口 (例如 140.123.105.233:9001)
\ No newline at end of file
@@ -1,20 +1,39 @@
 import os
 import io
-import json # 新增：用於解析 Gemini 返回的 JSON 字串
+import re
+import time
+import orjson
+import asyncio
+import hashlib
 import logging
+import functools
+import threading
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
-from PIL import Image
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, List, Set, Tuple, Union
+import httpx
+import numpy as np
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from cachetools import TTLCache
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 # 引入 Google GenAI SDK
 from google import genai
 from google.genai import types
 from google.genai.errors import APIError # 新增：明確處理 API 錯誤
 
+from report_stream import ReportFieldStreamer
+
 # 載入 .env 檔案中的環境變數
 load_dotenv()
 
@@ -26,7 +45,17 @@ if not GEMINI_API_KEY:
     
 try:
     # 初始化 Gemini Client
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    # client.aio 在整個行程共用同一個 httpx.AsyncClient；放寬 keep-alive 連線數與存活時間，
+    # 讓並行的 Gemini 呼叫重複使用已完成 TLS 交握的連線。timeout 單位為毫秒。
+    client = genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(
+            timeout=30_000,
+            async_client_args={
+                "limits": httpx.Limits(max_connections=64, max_keepalive_connections=64, keepalive_expiry=60),
+            },
+        ),
+    )
 except Exception as e:
     logging.error(f"初始化 Gemini Client 失敗: {e}")
     client = None
@@ -92,12 +121,146 @@ You MUST use this format when concluding the task:
 """
 # ^^^^^^ 替換為高度結構化的新 SYSTEM_PROMPT ^^^^^^
 
+# --- FINAL OUTPUT FORMAT 的結構化輸出 schema ---
+# 以 response_schema 約束模型輸出，回覆保證是可解析的 JSON，不必再用 find('{') / rfind('}') 擷取
+
+class ReportMessage(BaseModel):
+    verdict: str  # TRUE / FALSE / MIXED / UNDETERMINED
+    report: str   # Markdown 格式的查核報告
+
+class ReportTask(BaseModel):
+    sender: str
+    receiver: str
+    message: ReportMessage
+
+class Report(BaseModel):
+    tasks: List[ReportTask]
+
+# --- SYSTEM_PROMPT 的 Gemini 顯式快取 (context caching) ---
+# SYSTEM_PROMPT 只在伺服器端註冊一次，請求中以 cached_content 引用，不必每次重送並重新 prefill。
+# 建立失敗時 (例如 Prompt 短於模型的最小快取長度) 退回每次內嵌 system_instruction。
+SYSTEM_PROMPT_CACHE_TTL = 3600
+# 換成新快取後，舊快取再保留這段時間才刪除：等待 Semaphore 或重試退避中的請求仍帶著舊快取的名稱
+SYSTEM_PROMPT_CACHE_GRACE = 180
+SYSTEM_PROMPT_CACHE = None
+SYSTEM_PROMPT_CACHE_EXPIRES_AT = 0.0
+SYSTEM_PROMPT_CACHE_LOCK = asyncio.Lock()
+_CACHE_CLEANUP_TASKS: Set[asyncio.Task] = set()
+
+async def delete_system_prompt_cache_later(name: str, delay: float) -> None:
+    """等待 delay 秒後刪除舊的 SYSTEM_PROMPT 快取；刪除失敗也無妨，快取會在自己的 TTL 到期時消失"""
+    await asyncio.sleep(delay)
+    try:
+        await client.aio.caches.delete(name=name)
+    except Exception as e:
+        logging.warning(f"刪除舊的 SYSTEM_PROMPT 快取失敗: {e}")
+
+async def rebuild_system_prompt_cache():
+    """以目前的 SYSTEM_PROMPT 重新建立快取，舊快取在 SYSTEM_PROMPT_CACHE_GRACE 秒後才刪除"""
+    global SYSTEM_PROMPT_CACHE, SYSTEM_PROMPT_CACHE_EXPIRES_AT
+    old_cache, SYSTEM_PROMPT_CACHE = SYSTEM_PROMPT_CACHE, None
+    if old_cache:
+        task = asyncio.create_task(delete_system_prompt_cache_later(old_cache.name, SYSTEM_PROMPT_CACHE_GRACE))
+        _CACHE_CLEANUP_TASKS.add(task)
+        task.add_done_callback(_CACHE_CLEANUP_TASKS.discard)
+
+    # 任何錯誤 (API 錯誤、連線失敗、逾時) 都退回內嵌 system_instruction，不讓啟動或使用者請求失敗
+    try:
+        SYSTEM_PROMPT_CACHE = await client.aio.caches.create(
+            model=MODEL_NAME,
+            config=types.CreateCachedContentConfig(
+                system_instruction=SYSTEM_PROMPT,
+                ttl=f"{SYSTEM_PROMPT_CACHE_TTL}s",
+            ),
+        )
+        # 提前 SYSTEM_PROMPT_CACHE_GRACE 秒換新，仍在使用舊快取的請求在它真正到期前就能完成
+        SYSTEM_PROMPT_CACHE_EXPIRES_AT = time.monotonic() + SYSTEM_PROMPT_CACHE_TTL - SYSTEM_PROMPT_CACHE_GRACE
+        logging.info(f"已建立 SYSTEM_PROMPT 快取: {SYSTEM_PROMPT_CACHE.name}")
+    except Exception as e:
+        logging.warning(f"建立 SYSTEM_PROMPT 快取失敗，改為每次請求內嵌 system_instruction: {e}")
+
+async def build_generate_config() -> types.GenerateContentConfig:
+    """靜態的 SYSTEM_PROMPT 走快取前綴，變動的使用者內容則放在 contents 最後"""
+    if SYSTEM_PROMPT_CACHE is not None and time.monotonic() >= SYSTEM_PROMPT_CACHE_EXPIRES_AT:
+        async with SYSTEM_PROMPT_CACHE_LOCK:
+            if SYSTEM_PROMPT_CACHE is not None and time.monotonic() >= SYSTEM_PROMPT_CACHE_EXPIRES_AT:
+                await rebuild_system_prompt_cache()
+
+    if SYSTEM_PROMPT_CACHE is not None:
+        return types.GenerateContentConfig(
+            cached_content=SYSTEM_PROMPT_CACHE.name,
+            temperature=0.2,
+            response_mime_type="application/json",
+            response_schema=Report,
+        )
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_PROMPT,
+        temperature=0.2,
+        response_mime_type="application/json",
+        response_schema=Report,
+    )
+
+# --- Gemini 呼叫的重試 ---
+# 只重試速率限制 (429) 與服務暫時無法使用 (503)，其餘錯誤直接回報
+GEMINI_RETRY_STATUS_CODES = {429, 503}
+
+def is_retriable_gemini_error(exc: BaseException) -> bool:
+    return isinstance(exc, APIError) and exc.code in GEMINI_RETRY_STATUS_CODES
+
+def log_gemini_retry(retry_state: RetryCallState) -> None:
+    logging.warning(
+        f"Gemini API 呼叫失敗，第 {retry_state.attempt_number} 次重試前等待: {retry_state.outcome.exception()}"
+    )
+
+# 限制同時進行中的 Gemini 呼叫數，讓突發流量平滑地分散，不會一次撞上 QPM 上限。
+# 只包住單次呼叫：重試退避期間不佔名額。
+GEMINI_MAX_IN_FLIGHT = 16
+GEMINI_SEMAPHORE = asyncio.Semaphore(GEMINI_MAX_IN_FLIGHT)
+
+async def generate_content_with_retry(contents: List[Any], config: types.GenerateContentConfig) -> types.GenerateContentResponse:
+    """呼叫 client.aio.models.generate_content，遇到 429/503 以指數退避 + jitter 重試，最多 4 次"""
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(is_retriable_gemini_error),
+        wait=wait_exponential_jitter(initial=0.5, max=8, jitter=0.5),
+        stop=stop_after_attempt(4),
+        before_sleep=log_gemini_retry,
+        reraise=True,
+    ):
+        with attempt:
+            async with GEMINI_SEMAPHORE:
+                return await client.aio.models.generate_content(
+                    model=MODEL_NAME,
+                    contents=contents,
+                    config=config,
+                )
+
+def log_semantic_warm_up_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"語意快取模型載入失敗，停用語意快取: {task.exception()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    啟動時註冊 SYSTEM_PROMPT 快取。
+    啟用語意快取時，模型在背景載入，不拖慢 worker 啟動，也不會讓第一個請求負擔下載 / 匯入的時間。
+    """
+    if client:
+        await rebuild_system_prompt_cache()
+    semantic_warm_up = None
+    if SEMANTIC_CACHE_ENABLED:
+        semantic_warm_up = asyncio.create_task(asyncio.to_thread(SEMANTIC_CACHE.warm_up))
+        semantic_warm_up.add_done_callback(log_semantic_warm_up_failure)
+    yield
+    if semantic_warm_up:
+        semantic_warm_up.cancel()
+
 
 # FastAPI 應用初始化
 app = FastAPI(
     title="Gemini 多模態防詐騙查核 API",
     description="使用 Google Gemini API 處理文字、音檔和圖片，進行潛在詐騙內容的風險評估。",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 設置 CORS 中間件 (讓前端可以跨域呼叫)
@@ -109,19 +272,291 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- 查核結果快取 ---
+# 相同的文字 / 檔案內容 / Prompt 版本直接回傳上次解析好的報告，略過 Gemini 呼叫
+# PROMPT_VERSION 在 /update_prompt 時遞增，使舊 Prompt 產生的快取自然失效
+PROMPT_VERSION = 0
+PROMPT_LOCK = asyncio.Lock()
+REPORT_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+REPORT_CACHE_LOCK = asyncio.Lock()
+
+
+# --- 重量級相依套件延遲載入 ---
+# sentence-transformers 會連帶匯入 torch (約 1~2 秒)，FAISS 與 Pillow 也只有部分請求用得到；
+# 第一次使用時才匯入，uvicorn worker 啟動快，只處理純文字 / 從未觸發的功能不必付出記憶體成本
+
+@functools.lru_cache(maxsize=None)
+def _get_embedder(model_name: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+@functools.lru_cache(maxsize=1)
+def _get_faiss() -> Any:
+    import faiss
+    return faiss
+
+@functools.lru_cache(maxsize=1)
+def _get_pil_image() -> Any:
+    from PIL import Image
+    return Image
+
+
+class SemanticCache:
+    """
+    純文字查詢的語意快取：改寫過的同一則詐騙訊息 (例如「我收到一封簡訊說中獎」與「剛收到中獎通知簡訊」)
+    也能命中。句向量經 L2 正規化後存入 FAISS IndexFlatIP，內積即 cosine 相似度。
+
+    - 相似度 ≥ hit_threshold：命中
+    - gray_threshold ≤ 相似度 < hit_threshold：灰色地帶，寧可重新查核也不冒誤判的風險，視為未命中
+    - 相似度 < gray_threshold：未命中
+
+    模型與 FAISS 由 lifespan 在背景執行 warm_up() 載入 (僅在 SEMANTIC_CACHE_ENABLED 時)，
+    完成前 (或未啟用、載入失敗時) 這一層一律視為未命中。
+    只差在網址、電話或帳號的兩則訊息句向量幾乎相同，判定結果卻可能完全相反，因此含這類內容的文字不使用語意快取。
+    """
+
+    # 網址 / 網域，以及 6 位以上 (可含空白或 - 分隔) 的數字：電話、帳號、驗證碼等
+    _EXACT_ONLY_TOKENS = re.compile(
+        r"https?://|www\.|[a-z0-9-]+\.(?:com|net|org|tw|cc|io|me|xyz|top|info|link)\b|\d(?:[\s-]?\d){5,}",
+        re.IGNORECASE,
+    )
+
+    def __init__(
+        self,
+        model_name: str = "paraphrase-multilingual-MiniLM-L12-v2",
+        hit_threshold: float = 0.9,
+        gray_threshold: float = 0.8,
+        max_entries: int = 4096,
+    ):
+        # 模型與 FAISS index 由 warm_up() 建立
+        self.model_name = model_name
+        self.index: Optional[Any] = None
+        self.ready = False
+        self.hit_threshold = hit_threshold
+        self.gray_threshold = gray_threshold
+        self.max_entries = max_entries
+        # 與 index 中向量順序一一對應的 (prompt_version, report)
+        self.entries: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """載入句向量模型並建立 FAISS index (會下載模型並匯入 torch，請在 threadpool 中呼叫)"""
+        embedder = _get_embedder(self.model_name)
+        index = _get_faiss().IndexFlatIP(embedder.get_sentence_embedding_dimension())
+        with self._lock:
+            self.index = index
+            self.ready = True
+        logging.info(f"語意快取模型已載入: {self.model_name}")
+
+    def accepts(self, text: str) -> bool:
+        """模型已就緒且文字中沒有必須逐字比對的網址 / 長數字時，才使用語意快取"""
+        return self.ready and not self._EXACT_ONLY_TOKENS.search(text)
+
+    def embed(self, text: str) -> np.ndarray:
+        """計算 L2 正規化後的句向量 (CPU 密集，請在 threadpool 中呼叫)"""
+        embedder = _get_embedder(self.model_name)
+        return embedder.encode([text], normalize_embeddings=True).astype("float32")
+
+    def lookup(self, embedding: np.ndarray, prompt_version: int) -> Optional[str]:
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return None
+            scores, ids = self.index.search(embedding, 1)
+            score = float(scores[0][0])
+            entry_version, report = self.entries[int(ids[0][0])]
+
+        if score < self.hit_threshold:
+            if score >= self.gray_threshold:
+                logging.info(f"語意快取落在灰色地帶 (相似度 {score:.3f})，重新查核")
+            return None
+        if entry_version != prompt_version:
+            return None
+        return report
+
+    def store(self, embedding: np.ndarray, prompt_version: int, report: str) -> None:
+        with self._lock:
+            if self.index is None:
+                return
+            # IndexFlatIP 不支援逐筆淘汰，滿了就整個清空重建
+            if self.index.ntotal >= self.max_entries:
+                self.index.reset()
+                self.entries.clear()
+            self.index.add(embedding)
+            self.entries.append((prompt_version, report))
+
+    def clear(self) -> None:
+        with self._lock:
+            if self.index is not None:
+                self.index.reset()
+            self.entries.clear()
+
+
+# 是否啟用語意快取 (預設關閉)；開啟後每個 worker 啟動時都會在背景下載模型並匯入 torch / FAISS
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE = SemanticCache()
+
 # --- 輔助函數 ---
 
+# 快取鍵只需要辨識內容是否相同：128-bit 的 BLAKE2b 比 SHA-256 快且鍵更短
+def new_cache_hash(data: bytes = b"") -> "hashlib.blake2b":
+    return hashlib.blake2b(data, digest_size=16)
+
+EMPTY_FILE_HASH = new_cache_hash().hexdigest()
+
+# 上傳檔案大小上限與每次讀取的區塊大小；
+# 媒體以 inline bytes 傳給 Gemini，而 inline 資料上限為 20MB，超過的檔案直接回 413
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def read_upload(file: UploadFile) -> Tuple[bytes, str]:
+    """
+    以 1MB 區塊讀取上傳檔案，超過 MAX_UPLOAD_BYTES 立即回 413，不必先把整個檔案讀進記憶體；
+    同一次讀取順便計算 BLAKE2b，作為快取鍵的檔案雜湊。
+    """
+    buf = bytearray()
+    file_hash = new_cache_hash()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buf.extend(chunk)
+        file_hash.update(chunk)
+        if len(buf) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"檔案大小超過限制 ({MAX_UPLOAD_BYTES // (1024 * 1024)}MB)。")
+    return bytes(buf), file_hash.hexdigest()
+
+# 超過此大小的圖片先縮圖再送給 Gemini；長邊上限對齊 Gemini 視覺模型的切塊邊界
+IMAGE_DOWNSCALE_MIN_BYTES = 512_000
+IMAGE_MAX_EDGE = 1568
+IMAGE_JPEG_QUALITY = 85
+
+def downscale_image(file_bytes: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """
+    將大張截圖的長邊縮到 IMAGE_MAX_EDGE 並重新壓成 JPEG，減少上傳流量與圖片 input tokens。
+    小圖維持原樣 (CPU 密集，請在 threadpool 中呼叫)。
+    """
+    if len(file_bytes) <= IMAGE_DOWNSCALE_MIN_BYTES:
+        return file_bytes, mime_type
+    Image = _get_pil_image()
+    from PIL import ImageOps
+
+    img = Image.open(io.BytesIO(file_bytes))
+    # 重新編碼會丟掉 EXIF，先依 Orientation 轉正，手機直拍的照片才不會側躺
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.LANCZOS)
+
+    # JPEG 沒有透明度：透明背景貼到白底上，避免 convert("RGB") 把透明區域變成黑色
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+
+    out = io.BytesIO()
+    img.convert("RGB").save(out, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return out.getvalue(), "image/jpeg"
+
+def make_report_cache_key(text: Optional[str], file_hash: str, prompt_version: int) -> str:
+    """以文字與檔案內容的 BLAKE2b 雜湊加上 Prompt 版本組成快取鍵"""
+    text_hash = new_cache_hash((text or "").encode("utf-8")).hexdigest()
+    return f"{prompt_version}:{text_hash}:{file_hash}"
+
+def extract_report_content(raw_text: str, parsed: Optional[Any] = None) -> str:
+    """
+    取出 FINAL OUTPUT FORMAT 的 tasks[0].message.report。
+    SDK 已依 response_schema 解析出 Report 時直接使用，否則 (例如串流輸出) 以 orjson 解析原始 JSON。
+    """
+    if isinstance(parsed, Report):
+        return parsed.tasks[0].message.report
+    parsed_json = orjson.loads(raw_text)
+    return parsed_json['tasks'][0]['message']['report']
+
+async def store_report(
+    cache_key: str,
+    text_embedding: Optional[np.ndarray],
+    prompt_version: int,
+    report_content: str,
+) -> None:
+    """
+    將解析好的報告寫入精確快取與 (純文字查詢的) 語意快取。
+    prompt_version 為請求開始時的版本；查核期間 Prompt 已被更新時不寫入，避免舊 Prompt 的結果混入。
+    """
+    if prompt_version != PROMPT_VERSION:
+        return
+    async with REPORT_CACHE_LOCK:
+        REPORT_CACHE[cache_key] = report_content
+    if text_embedding is not None:
+        try:
+            SEMANTIC_CACHE.store(text_embedding, prompt_version, report_content)
+        except Exception as e:
+            logging.warning(f"語意快取寫入失敗，略過: {e}")
+
+def to_sse(event: str, data: Dict[str, Any]) -> str:
+    """編碼為一則 Server-Sent Event (data 以 JSON 表示，避免報告中的換行破壞 SSE 格式)"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+def sse_response(events: Union[Iterable[str], AsyncIterator[str]]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
+async def stream_scam_report(
+    final_content: List[Any],
+    config: types.GenerateContentConfig,
+    cache_key: str,
+    text_embedding: Optional[np.ndarray],
+    prompt_version: int,
+) -> AsyncIterator[str]:
+    """
+    以 generate_content_stream 呼叫 Gemini，報告欄位一生成就以 SSE 的 report_delta 事件送出；
+    生成結束後解析完整 JSON、寫入快取，最後送出 done 事件 (含完整報告)。
+    """
+    raw_chunks = []
+    report_streamer = ReportFieldStreamer()
+    try:
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=MODEL_NAME,
+            contents=final_content,
+            config=config,
+        ):
+            if not chunk.text:
+                continue
+            raw_chunks.append(chunk.text)
+            report_delta = report_streamer.feed(chunk.text)
+            if report_delta:
+                yield to_sse("report_delta", {"text": report_delta})
+
+        raw_text = "".join(raw_chunks).strip()
+        try:
+            report_content = extract_report_content(raw_text)
+        except (orjson.JSONDecodeError, KeyError, IndexError) as json_err:
+            logging.error(f"模型輸出 JSON 解析失敗: {json_err}. 原始輸出: {raw_text}")
+            yield to_sse("error", {"detail": f"AI 報告生成格式錯誤。請檢查 System Prompt。原始輸出: {raw_text[:200]}..."})
+            return
+
+        await store_report(cache_key, text_embedding, prompt_version, report_content)
+        yield to_sse("done", {"report": report_content})
+
+    except APIError as e:
+        logging.error(f"Gemini API 呼叫失敗: {e}")
+        yield to_sse("error", {"detail": f"Gemini API 呼叫失敗: {str(e)}"})
+    except Exception as e:
+        # 標頭 (200) 已送出，其他錯誤 (例如逾時、報告欄位跳脫字元格式錯誤) 也必須以 error 事件結束串流
+        logging.error(f"串流查核報告失敗: {e}")
+        yield to_sse("error", {"detail": f"伺服器處理錯誤: {str(e)}"})
+
+# 副檔名 → MIME 類型 (音檔使用 Gemini 接受的標準 MIME，例如 mp3 為 audio/mpeg、m4a 為 audio/mp4)
+_MIME_MAP = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "m4a": "audio/mp4",
+    "webm": "audio/webm",
+}
+
 def get_mime_type(filename: str) -> str:
     """根據副檔名判斷 MIME 類型"""
-    ext = filename.split('.')[-1].lower()
-    if ext in ['jpg', 'jpeg']:
-        return "image/jpeg"
-    elif ext == 'png':
-        return "image/png"
-    # GenAI 支援多種音檔，但上傳時我們維持通用或使用常見的 webm/m4a
-    elif ext in ['wav', 'mp3', 'flac', 'm4a', 'webm']: 
-        return f"audio/{ext}" 
-    return "application/octet-stream"
+    ext = os.path.splitext(filename)[1][1:].lower()
+    return _MIME_MAP.get(ext, "application/octet-stream")
 
 async def check_key_and_client():
     """檢查 API Key 和 Client 是否成功初始化"""
@@ -142,8 +577,17 @@ async def update_prompt(update: PromptUpdate):
     """
     更新系統 Prompt 的 API 接口。
     """
-    global SYSTEM_PROMPT
-    SYSTEM_PROMPT = update.new_prompt
+    global SYSTEM_PROMPT, PROMPT_VERSION
+    # 同一時間只允許一個更新：Prompt、版本號、兩層查核快取與 Gemini 快取一起切換
+    async with PROMPT_LOCK:
+        SYSTEM_PROMPT = update.new_prompt
+        PROMPT_VERSION += 1
+        async with REPORT_CACHE_LOCK:
+            REPORT_CACHE.clear()
+        SEMANTIC_CACHE.clear()
+        if client:
+            async with SYSTEM_PROMPT_CACHE_LOCK:
+                await rebuild_system_prompt_cache()
     return {"message": "系統 Prompt 更新成功", "new_prompt_length": len(SYSTEM_PROMPT)}
 
 @app.get("/get_prompt")
@@ -156,132 +600,129 @@ def get_prompt():
 async def check_scam_report(
     text: Optional[str] = Form(None), 
     file: Optional[UploadFile] = File(None), 
+    stream: bool = Form(False), # true 時以 SSE 逐步回傳報告
 ):
     """
     多模態詐騙查核 API 接口。
+    stream=true 時回傳 text/event-stream：report_delta 事件為報告片段，done 事件含完整報告。
     """
     await check_key_and_client()
 
     if not text and not file:
         raise HTTPException(status_code=400, detail="請提供至少一項文字、音檔或圖片內容進行查核。")
 
+    # 整個請求都使用開始時的 Prompt 版本 (單一賦值的讀取在 CPython 中是原子的，不需要鎖)
+    prompt_version = PROMPT_VERSION
+
+    # 0. 讀取檔案並查詢快取，命中時不必組 Prompt 或呼叫 Gemini
+    file_bytes, file_hash = await read_upload(file) if file else (b"", EMPTY_FILE_HASH)
+    cache_key = make_report_cache_key(text, file_hash, prompt_version)
+    async with REPORT_CACHE_LOCK:
+        cached_report = REPORT_CACHE.get(cache_key)
+    if cached_report is not None:
+        logging.info(f"查核結果快取命中: {cache_key}")
+        if stream:
+            return sse_response([to_sse("done", {"report": cached_report})])
+        return {"report": cached_report}
+
+    # 純文字查詢再查語意快取 (檔案內容變化太大，不適用)；快取層出錯時一律視為未命中，不影響查核
+    text_embedding = None
+    if text and not file and SEMANTIC_CACHE.accepts(text):
+        try:
+            text_embedding = await asyncio.to_thread(SEMANTIC_CACHE.embed, text)
+            cached_report = SEMANTIC_CACHE.lookup(text_embedding, prompt_version)
+        except Exception as e:
+            logging.warning(f"語意快取查詢失敗，視為未命中: {e}")
+            text_embedding, cached_report = None, None
+        if cached_report is not None:
+            logging.info("語意快取命中")
+            if stream:
+                return sse_response([to_sse("done", {"report": cached_report})])
+            return {"report": cached_report}
+
     # 1. 準備 Gemini API 的內容列表
     content_parts = []
-    # 這裡的 user_prompt_text 變得更簡單，因為所有複雜邏輯都在 SYSTEM_PROMPT 裡了
-    user_prompt_text = "Boss 的查核任務內容如下：\n"
+    # 這裡的 user prompt 變得更簡單，因為所有複雜邏輯都在 SYSTEM_PROMPT 裡了
+    # 各段先收集在 prompt_parts，最後一次 "".join，避免在分支中反覆 += 複製字串
+    prompt_parts = ["Boss 的查核任務內容如下：\n"]
 
     # 2. 處理文字輸入
     if text:
         content_parts.append(text)
-        user_prompt_text += f"**[文字內容]**: {text}。請以台灣地區的繁體中文回覆\n"
+        prompt_parts.append(f"**[文字內容]**: {text}。請以台灣地區的繁體中文回覆\n")
 
     # 3. 處理檔案輸入 (音檔或圖片)
-    uploaded_file = None
-    try:
-        if file:
-            file_bytes = await file.read()
-            # print(file_bytes)
-            mime_type = get_mime_type(file.filename)
-            # print(mime_type)
-            
-            file_size_mb = len(file_bytes) / (1024 * 1024)
-            if file_size_mb > 50: 
-                raise HTTPException(status_code=413, detail=f"檔案大小超過限制 ({file_size_mb:.2f}MB)。")
-                
-            
-            # 檔案處理 (音檔或圖片)
+    if file:
+        mime_type = get_mime_type(file.filename)
+
+        # 依 MIME 類型決定提示文字；不支援的類型直接回 400，不進入下面的 try
+        if mime_type.startswith("image/"):
+            media_prompt = "**[圖片檔案]** 已上傳，請分析圖片中的文字和內容，以台灣地區的繁體中文回覆。\n"
+        elif mime_type.startswith("audio/"):
+            media_prompt = "**[語音檔案]** 已上傳，請先進行語音轉文字 (STT)，然後再根據語音內容進行分析，以台灣地區的繁體中文回覆。\n"
+        else:
+            raise HTTPException(status_code=400, detail=f"不支援的檔案類型: {mime_type}")
+
+        # try 只包住實際的檔案轉換 (縮圖 / 建立 Part)
+        try:
             if mime_type.startswith("image/"):
-                # img = Image.open(io.BytesIO(file_bytes))
-                # uploaded_file = client.files.upload(file=img, mime_type=mime_type)
-                # uploaded_file = client.files.upload(file=img)
-                # content_parts.append(uploaded_file)
-                media_part = types.Part.from_bytes(
-                    data=file_bytes, 
-                    mime_type=mime_type
-                )
-                content_parts.append(media_part)
-                user_prompt_text += f"**[圖片檔案]** 已上傳，請分析圖片中的文字和內容，以台灣地區的繁體中文回覆。\n"
-
-            elif mime_type.startswith("audio/"):
-                # 為了更好的音檔支援，我們直接使用 BytesIO 和正確的 mime_type
-                # uploaded_file = client.files.upload(file=io.BytesIO(file_bytes), mime_type=mime_type)
-                # uploaded_file = client.files.upload(file=io.BytesIO(file_bytes))
-                # content_parts.append(uploaded_file)
-                media_part = types.Part.from_bytes(
-                    data=file_bytes, 
-                    mime_type=mime_type
-                )
-                content_parts.append(media_part)
-                user_prompt_text += f"**[語音檔案]** 已上傳，請先進行語音轉文字 (STT)，然後再根據語音內容進行分析，以台灣地區的繁體中文回覆。\n"
-                
+                media_bytes, media_mime_type = await asyncio.to_thread(downscale_image, file_bytes, mime_type)
             else:
-                raise HTTPException(status_code=400, detail=f"不支援的檔案類型: {mime_type}")
-                
-    except Exception as e:
-        # 處理檔案上傳或轉換錯誤
-        logging.error(f"檔案處理失敗: {e}")
-        # 如果上傳了檔案但處理失敗，嘗試刪除
-        if uploaded_file:
-            client.files.delete(name=uploaded_file.name)
-        raise HTTPException(status_code=500, detail=f"檔案處理失敗: {str(e)}")
+                media_bytes, media_mime_type = file_bytes, mime_type
+            media_part = types.Part.from_bytes(data=media_bytes, mime_type=media_mime_type)
+        except Exception as e:
+            # 處理檔案轉換錯誤
+            logging.error(f"檔案處理失敗: {e}")
+            raise HTTPException(status_code=500, detail=f"檔案處理失敗: {str(e)}")
+
+        content_parts.append(media_part)
+        prompt_parts.append(media_prompt)
 
 
     # 4. 組合最終給模型的 Prompt
-    final_content = content_parts + [user_prompt_text]
+    # 使用者 Prompt 放在媒體內容之後；直接 append 而不是 content_parts + [...] 另建新 list
+    content_parts.append("".join(prompt_parts))
+    final_content = content_parts
 
 
     # 5. 呼叫 Gemini API
     try:
         logging.info(f"開始呼叫 Gemini API，模型: {MODEL_NAME}")
         
-        config = types.GenerateContentConfig(
-            system_instruction=SYSTEM_PROMPT,
-            temperature=0.2, 
-        )
+        config = await build_generate_config()
 
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=final_content,
-            config=config,
-        )
+        if stream:
+            return sse_response(stream_scam_report(final_content, config, cache_key, text_embedding, prompt_version))
+
+        # 使用非同步 API，避免阻塞 event loop
+        response = await generate_content_with_retry(final_content, config)
         
         raw_text = response.text.strip()
         
         # ⚠️ 新增: 解析 Gemini 返回的 JSON 字串
         try:
             # 由於我們強制模型輸出 JSON，必須將其解析
-            # 找到 JSON 的開始和結束
-            start_index = raw_text.find('{')
-            end_index = raw_text.rfind('}') + 1
-            json_str = raw_text[start_index:end_index]
-            
-            # 使用 json 庫解析，這裡需要處理雙引號轉義
-            parsed_json = json.loads(json_str)
-            
-            # 從解析後的 JSON 中提取 report 內容
             # 根據 FINAL OUTPUT FORMAT: tasks[0].message.report
-            report_content = parsed_json['tasks'][0]['message']['report']
+            report_content = extract_report_content(raw_text, response.parsed)
             
-        except (json.JSONDecodeError, KeyError) as json_err:
+        except (orjson.JSONDecodeError, KeyError, IndexError) as json_err:
              # 如果解析失敗，或者 JSON 格式不對，視為模型輸出格式錯誤
             logging.error(f"模型輸出 JSON 解析失敗: {json_err}. 原始輸出: {raw_text}")
             raise HTTPException(status_code=500, detail=f"AI 報告生成格式錯誤。請檢查 System Prompt。原始輸出: {raw_text[:200]}...")
 
 
-        # 6. 清理上傳的檔案 (重要!)
-        if uploaded_file:
-            client.files.delete(name=uploaded_file.name)
-            logging.info(f"已刪除暫存檔案: {uploaded_file.name}")
+        await store_report(cache_key, text_embedding, prompt_version, report_content)
             
         # 回傳報告內容給前端 (前端需要的是 report 欄位中的 Markdown 字串)
         return {"report": report_content}
 
+    except HTTPException:
+        # 已帶有正確狀態碼的錯誤 (例如報告格式錯誤) 原樣拋出，不再包成「伺服器處理錯誤」
+        raise
+
     except APIError as e:
         # 處理 GenAI API 錯誤 (例如 Key 錯誤、模型錯誤等)
         logging.error(f"Gemini API 呼叫失敗: {e}")
-        # 清理可能尚未清理的檔案
-        if uploaded_file:
-            client.files.delete(name=uploaded_file.name)
         raise HTTPException(status_code=500, detail=f"Gemini API 呼叫失敗: {str(e)}")
         
     except Exception as e:
@@ -291,4 +732,8 @@ async def check_scam_report(
 
 
 # --- 運行後端服務 ---
-# uvicorn main:app --reload --host 0.0.0.0 --port 9001
\ No newline at end of file
+# uvicorn main:app --reload --host 0.0.0.0 --port 9001
+# 正式環境使用 uvloop 事件迴圈與 httptools HTTP 解析器 (Windows 不支援 uvloop，請拿掉 --loop uvloop 或改用 winloop):
+# uvicorn single_as_multi:app --loop uvloop --http httptools --host 0.0.0.0 --port 9001
+# 請維持單一 worker：SYSTEM_PROMPT 與查核快取都是行程內的全域變數，/update_prompt 只會更新收到該請求的 worker，
+# 且每個 worker 都會各自建立 (並付費維持) 一份 Gemini context cache
\ No newline at end of file
@@ -0,0 +1,77 @@
+import types
+import unittest
+
+import orjson
+
+try:
+    from fastapi.testclient import TestClient
+    import google.genai.errors as genai_errors
+    import agent_executor
+except ImportError as e:  # 未安裝服務的相依套件時略過
+    agent_executor = None
+    IMPORT_ERROR = e
+
+
+class FakeModels:
+    def __init__(self, chunks=(), error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def generate_content_stream(self, **kwargs):
+        if self.error is not None:
+            raise self.error
+
+        async def stream():
+            for text in self.chunks:
+                yield types.SimpleNamespace(text=text, prompt_feedback=None)
+
+        return stream()
+
+
+def fake_genai_client(**kwargs):
+    return types.SimpleNamespace(aio=types.SimpleNamespace(models=FakeModels(**kwargs)))
+
+
+@unittest.skipIf(agent_executor is None, "agent_executor 的相依套件未安裝")
+class ProcessAgentTaskTest(unittest.TestCase):
+    def setUp(self):
+        # 不進入 lifespan (不會建立真的 genai.Client)，直接放入假的 client
+        self.client = TestClient(agent_executor.app_agent)
+        agent_executor.app_agent.state.genai_client = None
+
+    def post_task(self, genai_client):
+        agent_executor.app_agent.state.genai_client = genai_client
+        return self.client.post(
+            "/process_agent_task",
+            json={"system_prompt": "system", "user_prompt": "這是一則測試訊息"},
+        )
+
+    def test_streams_deltas_then_report(self):
+        response = self.post_task(fake_genai_client(chunks=['{"tasks": ', "[]}"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+
+        events = [orjson.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([event["type"] for event in events], ["delta", "delta", "report"])
+        self.assertEqual("".join(event["text"] for event in events[:2]), '{"tasks": []}')
+        self.assertIn("這是一則測試訊息", events[-1]["report"])
+
+    def test_retriable_error_before_output_returns_status(self):
+        error = genai_errors.APIError(429, {"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+        response = self.post_task(fake_genai_client(error=error))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["type"], "error")
+        self.assertTrue(response.json()["retriable"])
+
+    def test_non_retriable_error_is_reported_in_band(self):
+        error = genai_errors.APIError(400, {"error": {"message": "bad request", "status": "INVALID_ARGUMENT"}})
+        response = self.post_task(fake_genai_client(error=error))
+        self.assertEqual(response.status_code, 200)
+        events = [orjson.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["type"], "error")
+        self.assertFalse(events[0]["retriable"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60.0, clock=self.clock)
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_stays_closed_below_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_opens_at_threshold(self):
+        self.trip()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow_request())
+
+        self.clock.now += 59.9
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_open_after_recovery_timeout(self):
+        self.trip()
+        self.clock.now += 60.0
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_half_open_failure_reopens(self):
+        self.trip()
+        self.clock.now += 60.0
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow_request())
+
+        # 重新開路後要再等一個完整的 recovery_timeout
+        self.clock.now += 59.9
+        self.assertFalse(self.breaker.allow_request())
+        self.clock.now += 0.1
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_half_open_success_resets(self):
+        self.trip()
+        self.clock.now += 60.0
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.failure_count, 0)
+
+        # 復原後需要重新累積到門檻才會開路
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_success_resets_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
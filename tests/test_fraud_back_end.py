@@ -0,0 +1,105 @@
+import asyncio
+import importlib
+import unittest
+
+import orjson
+
+try:
+    import httpx
+    from fastapi.testclient import TestClient
+    # 模組名稱含連字號，無法直接 import
+    fraud_back_end = importlib.import_module("fraud_back-end")
+except ImportError:  # 未安裝服務的相依套件時略過
+    fraud_back_end = None
+
+
+def agent_transport(responses, calls):
+    """依序回傳 responses 中的回應 (或拋出其中的例外) 的假 Agent 服務"""
+    def handler(request):
+        calls.append(request)
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return httpx.MockTransport(handler)
+
+
+def ndjson(*events):
+    return b"".join(orjson.dumps(event) + b"\n" for event in events)
+
+
+@unittest.skipIf(fraud_back_end is None, "fraud_back-end 的相依套件未安裝")
+class OpenAgentStreamTest(unittest.TestCase):
+    def open_stream(self, responses):
+        calls = []
+
+        async def run():
+            async with httpx.AsyncClient(transport=agent_transport(responses, calls)) as client:
+                response = await fraud_back_end.open_agent_stream(client, "prompt")
+                await response.aclose()
+                return response
+
+        return asyncio.run(run()), calls
+
+    def test_retries_transient_status(self):
+        response, calls = self.open_stream([httpx.Response(503), httpx.Response(200, content=b"")])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_read_timeout_is_sent_once(self):
+        calls = []
+
+        async def run():
+            async with httpx.AsyncClient(transport=agent_transport([httpx.ReadTimeout("slow")], calls)) as client:
+                await fraud_back_end.open_agent_stream(client, "prompt")
+
+        with self.assertRaises(httpx.ReadTimeout):
+            asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+
+    def test_does_not_retry_client_error(self):
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.open_stream([httpx.Response(400)])
+
+
+@unittest.skipIf(fraud_back_end is None, "fraud_back-end 的相依套件未安裝")
+class CheckScamReportTest(unittest.TestCase):
+    def setUp(self):
+        fraud_back_end.AGENT_REPORT_CACHE.clear()
+        fraud_back_end.AGENT_CIRCUIT_BREAKER.record_success()
+        self.calls = []
+        # 不進入 lifespan，直接放入連到假 Agent 服務的 client
+        self.client = TestClient(fraud_back_end.app)
+
+    def post(self, agent_body, **form):
+        fraud_back_end.app.state.http_client = httpx.AsyncClient(
+            transport=agent_transport([httpx.Response(200, content=agent_body)], self.calls)
+        )
+        return self.client.post("/check_scam_report", data={"text": "恭喜中獎，請點連結領取", **form})
+
+    def test_returns_and_caches_report(self):
+        body = ndjson({"type": "delta", "text": "{"}, {"type": "report", "report": "# 報告", "status": "success"})
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"report": "# 報告", "status": "success"})
+
+        # 第二次命中快取，不再呼叫 Agent 服務
+        response = self.post(body)
+        self.assertEqual(response.json()["report"], "# 報告")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_missing_report_is_an_error_and_not_cached(self):
+        response = self.post(ndjson({"type": "delta", "text": "{"}))
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(fraud_back_end.AGENT_REPORT_CACHE), 0)
+
+    def test_streams_agent_events(self):
+        body = ndjson({"type": "delta", "text": "{"}, {"type": "report", "report": "# 報告", "status": "success"})
+        response = self.post(body, stream="true")
+        self.assertEqual(response.status_code, 200)
+        events = [orjson.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([event["type"] for event in events], ["delta", "report"])
+
+
+if __name__ == "__main__":
+    unittest.main()
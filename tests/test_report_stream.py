@@ -0,0 +1,80 @@
+import random
+import unittest
+
+import orjson
+
+from report_stream import ReportFieldStreamer
+
+# 含各種需要跳脫的字元：引號、反斜線、控制字元、中文、emoji (代理對)
+REPORT_ALPHABET = list('ab 中文詐騙風險"\\/\n\r\t\b\f\x01') + ["🚨", "⚠️", "✅", "😀"]
+
+
+def random_report(rng: random.Random) -> str:
+    return "".join(rng.choice(REPORT_ALPHABET) for _ in range(rng.randint(0, 80)))
+
+
+def encode_model_output(report: str, rng: random.Random) -> str:
+    """模擬模型輸出：有時以 \\uXXXX 跳脫非 ASCII (含代理對)，有時直接輸出 UTF-8"""
+    encoded = orjson.dumps(report).decode()
+    if rng.random() < 0.5:
+        escaped = []
+        for ch in report:
+            if ch in '"\\' or ord(ch) < 0x20 or ord(ch) > 0x7E:
+                units = ch.encode("utf-16-be")
+                escaped.extend(f"\\u{int.from_bytes(units[i:i + 2], 'big'):04x}" for i in range(0, len(units), 2))
+            else:
+                escaped.append(ch)
+        encoded = '"' + "".join(escaped) + '"'
+    return (
+        '{"tasks": [{"sender": "single_agent", "receiver": "boss", "message": '
+        '{"verdict": "FALSE", "report": ' + encoded + "}}]}"
+    )
+
+
+def split_randomly(text: str, rng: random.Random) -> list:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 8)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+class ReportFieldStreamerTest(unittest.TestCase):
+    def stream(self, chunks) -> str:
+        streamer = ReportFieldStreamer()
+        return "".join(streamer.feed(chunk) for chunk in chunks)
+
+    def test_randomized_chunk_splits(self):
+        rng = random.Random(20240601)
+        for _ in range(2000):
+            report = random_report(rng)
+            output = encode_model_output(report, rng)
+            self.assertEqual(orjson.loads(output)["tasks"][0]["message"]["report"], report)
+            self.assertEqual(self.stream(split_randomly(output, rng)), report)
+
+    def test_surrogate_pair_split_at_every_position(self):
+        output = '{"report": "A\\ud83d\\ude00B"}'
+        for cut in range(1, len(output)):
+            self.assertEqual(self.stream([output[:cut], output[cut:]]), "A😀B")
+
+    def test_one_character_at_a_time(self):
+        output = '{"verdict": "MIXED", "report": "第一行\\n\\"引號\\" \\\\ \\u26a0\\ufe0f"}'
+        self.assertEqual(self.stream(list(output)), '第一行\n"引號" \\ ⚠️')
+
+    def test_ignores_text_after_report_string(self):
+        streamer = ReportFieldStreamer()
+        self.assertEqual(streamer.feed('{"report": "done"'), "done")
+        self.assertEqual(streamer.feed(', "report": "again"}'), "")
+
+    def test_no_report_field(self):
+        self.assertEqual(self.stream(['{"tasks": [', "]}"]), "")
+
+    def test_malformed_unicode_escape_raises(self):
+        streamer = ReportFieldStreamer()
+        with self.assertRaises(ValueError):
+            streamer.feed('{"report": "\\uzzzz"}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+try:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import webpage_api
+except ImportError:  # 未安裝服務的相依套件時略過
+    webpage_api = None
+
+
+@unittest.skipIf(webpage_api is None, "webpage_api 的相依套件未安裝")
+class CachedStaticFilesTest(unittest.TestCase):
+    def setUp(self):
+        webpage_api.STATIC_FILE_CACHE.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        with open(os.path.join(self.directory.name, "index.html"), "wb") as f:
+            f.write("<html>防詐騙</html>".encode())
+
+        app = FastAPI()
+        app.mount("/", webpage_api.CachedStaticFiles(directory=self.directory.name, html=True))
+        self.client = TestClient(app)
+
+    def test_serves_from_cache_with_validators(self):
+        response = self.client.get("/index.html")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, "<html>防詐騙</html>".encode())
+        self.assertIn("last-modified", response.headers)
+        self.assertEqual(response.headers["cache-control"], webpage_api.STATIC_CACHE_CONTROL)
+        self.assertEqual(len(webpage_api.STATIC_FILE_CACHE), 1)
+
+        response = self.client.get("/index.html", headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request_falls_back_to_file_response(self):
+        response = self.client.get("/index.html", headers={"Range": "bytes=0-5"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"<html>")
+        self.assertEqual(len(webpage_api.STATIC_FILE_CACHE), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
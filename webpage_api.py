@@ -1,7 +1,72 @@
+import asyncio
+import hashlib
+from typing import Tuple
+
+from cachetools import LRUCache
 from fastapi.staticfiles import StaticFiles
 from fastapi import FastAPI
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+# 小於此大小的靜態檔案 (index.html、JS、CSS) 讀取一次後留在記憶體
+STATIC_CACHE_MAX_BYTES = 256 * 1024
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+# (路徑, mtime_ns, size) -> (內容, ETag)；mtime/size 在快取鍵中，檔案更新後自動重新讀取。
+# 只在 event loop 上讀寫，不需要鎖
+STATIC_FILE_CACHE: LRUCache = LRUCache(maxsize=64)
+
+
+def read_static_file(full_path: str) -> Tuple[bytes, str]:
+    """讀取整個檔案並以 BLAKE2b 計算 ETag (阻塞 I/O，請在 threadpool 中呼叫)"""
+    with open(full_path, "rb") as f:
+        body = f.read()
+    return body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles 的小檔案快取版本：256KB 以下的檔案從記憶體回傳並附上 ETag / Cache-Control，
+    瀏覽器帶著相同的 If-None-Match 再次請求時直接回 304。
+    較大的檔案與帶 Range 標頭的請求仍走原本的 FileResponse。
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        stat_result = getattr(response, "stat_result", None)
+        if (
+            not isinstance(response, FileResponse)
+            or response.status_code != 200
+            or stat_result is None
+            or stat_result.st_size > STATIC_CACHE_MAX_BYTES
+        ):
+            return response
+
+        request_headers = Headers(scope=scope)
+        if "range" in request_headers:
+            return response
+
+        # 命中時直接在 event loop 上取用，只有未命中才需要到 threadpool 讀檔
+        cache_key = (str(response.path), stat_result.st_mtime_ns, stat_result.st_size)
+        cached = STATIC_FILE_CACHE.get(cache_key)
+        if cached is None:
+            cached = await asyncio.to_thread(read_static_file, cache_key[0])
+            STATIC_FILE_CACHE[cache_key] = cached
+        body, etag = cached
+        headers = {
+            "ETag": etag,
+            "Last-Modified": response.headers["last-modified"],
+            "Cache-Control": STATIC_CACHE_CONTROL,
+        }
+
+        if_none_match = request_headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=response.media_type, headers=headers)
+
 
 app = FastAPI()
 
 # 提供 static 資料夾內容給 / 路徑（即首頁）
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+app.mount("/", CachedStaticFiles(directory="static", html=True), name="static")